@@ -4,14 +4,386 @@ Job Search Agent using Strands with built-in retrieve function tooling.
 This agent helps users find relevant job opportunities by querying knowledge bases.
 """
 
+import asyncio
+import contextlib
+import functools
+import hashlib
 import json
-from typing import Any, Dict, Optional
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
 
+import boto3
+from botocore.config import Config
 from strands import Agent
 from strands.agent.conversation_manager import SlidingWindowConversationManager
+from strands.models import BedrockModel
+from strands.telemetry.metrics import EventLoopMetrics
+from strands.tools.tools import PythonAgentTool
 from strands_tools import retrieve
 from bedrock_agentcore.runtime import BedrockAgentCoreApp
 
+# Accept plain-text or JSON-string payloads in addition to JSON objects (read once at import)
+ACCEPT_TEXT_PAYLOADS = os.environ.get("ACCEPT_TEXT_PAYLOADS", "true").lower() == "true"
+
+# Request size limits, checked before any agent work is done
+MAX_PROMPT_CHARS = 8000
+MAX_RESUME_CHARS = 200_000
+
+# Resume sections the compressor drops on follow-up turns; everything else is kept
+_RESUME_DROP_HEADING_RE = re.compile(
+    r"^(?:references?|(?:personal )?interests|hobbies|hobbies (?:and|&) interests|"
+    r"interests (?:and|&) hobbies)\s*:?$",
+    re.IGNORECASE,
+)
+
+# Any short line of words ("WORK HISTORY", "Technical Skills & Tools:") may start a new
+# section; it only needs to be good enough to tell where a dropped section ends
+_RESUME_ANY_HEADING_RE = re.compile(r"^[A-Za-z][A-Za-z &/-]{0,40}:?$")
+_RESUME_HEADING_JOINERS = ("&", "/", "-", "and", "of")
+
+# Roughly 1500 tokens of compressed resume per follow-up turn
+MAX_COMPRESSED_RESUME_CHARS = 6000
+
+# Keep-alive connection pool and adaptive retries for the Bedrock runtime client
+BEDROCK_CLIENT_CONFIG = Config(
+    max_pool_connections=64,
+    connect_timeout=5,
+    read_timeout=120,
+    retries={"mode": "adaptive", "max_attempts": 3},
+)
+
+# Cheaper model used to fold old session turns into a short memory block. The Claude 3.5
+# Haiku inference profile is US-only; elsewhere default to in-region Claude 3 Haiku.
+SUMMARY_MODEL_ID = os.environ.get("SUMMARY_MODEL_ID") or (
+    "us.anthropic.claude-3-5-haiku-20241022-v1:0"
+    if os.environ.get("AWS_REGION", "us-east-1").startswith("us-")
+    else "anthropic.claude-3-haiku-20240307-v1:0"
+)
+
+SUMMARY_PROMPT = (
+    "Summarize the following job search conversation in at most {max_words} words. "
+    "Preserve the user's background, skills, preferences and constraints, and the "
+    "companies and roles already recommended. Output only the summary."
+)
+
+# System prompt shared by every agent instance, built once at import
+SYSTEM_PROMPT = (
+    "You are a Career Job Search Agent for all fields/seniority.\n"
+    "Available Tools:\n"
+    "- retrieve: Query job information from Knowledge Base\n\n"
+    "Resume Processing:\n"
+    "When user provides resume text directly, analyze the content to understand skills, experience, education, and career trajectory.\n"
+    "Use this information to craft targeted job search queries.\n\n"
+    "Workflow:\n"
+    "1) Resume Analysis: If resume text provided, analyze background and extract key skills/experience\n"
+    "2) Company Recommendations: From resume keywords/interests, list 6–12 relevant companies (top‑tier + mission‑aligned). For each: Company — Why fit (1 line) — Careers URL.\n"
+    "3) Job Search: Use retrieve function to query job information from Knowledge Base. Compose strong queries from resume skills/titles/domains and constraints. Output bullets: Title — Company — Location — Link — 1‑line rationale.\n"
+    "4) Next Steps: Suggest concrete actions (tailoring, outreach/referrals, interview prep) and ask ONE precise follow‑up.\n\n"
+    "Context Continuity:\n"
+    "Remember previous conversations in this session. Reference earlier discussions about user's background, preferences, and job search progress.\n"
+    "Build upon previous recommendations and avoid repeating the same suggestions unless specifically requested.\n\n"
+    "Style: concise, bullet‑first, official links, recent postings only; group and rank best matches first.\n"
+    "Tool usage: Use retrieve for job search; issue independent queries as parallel retrieve calls in the same turn; degrade gracefully if tools unavailable.\n"
+    "Safety: No chain‑of‑thought; concise reasoning only; use only user‑provided information and resume content."
+)
+
+# System prompt as content blocks; the trailing cache point marks the tool specs and
+# system prompt (which precede it in the request) as a Bedrock prompt-cache prefix
+SYSTEM_PROMPT_BLOCKS = [{"text": SYSTEM_PROMPT}, {"cachePoint": {"type": "default"}}]
+
+class TTLCache:
+    """
+    Thread-safe, size-bounded LRU cache whose entries expire after a fixed TTL.
+    Used for replaying stateless agent responses and for knowledge base results.
+    """
+    
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        """
+        Initialize an empty cache.
+        
+        Args:
+            max_entries: Maximum number of entries before LRU eviction
+            ttl_seconds: How long an entry stays valid after it is stored
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Look up a cached value.
+        
+        Args:
+            key: Cache key
+            
+        Returns:
+            Cached value, or None on a miss or expired entry
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+    
+    def put(self, key: str, value: Any) -> None:
+        """
+        Store a value, evicting the least recently used entries if full.
+        
+        Args:
+            key: Cache key
+            value: Value to cache
+        """
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def clear(self) -> None:
+        """Remove all cached entries."""
+        with self._lock:
+            self._entries.clear()
+
+
+def _cache_key(text: str) -> str:
+    """
+    Hash text into a compact cache key.
+    
+    Args:
+        text: Text to hash
+        
+    Returns:
+        32-character hex digest (BLAKE2b, 16-byte digest)
+    """
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+# Replayable events of completed stateless responses
+_RESPONSE_CACHE = TTLCache(max_entries=512, ttl_seconds=900)
+
+# Knowledge base results by query; postings refresh daily, so six hours stays "recent"
+_RETRIEVE_CACHE = TTLCache(max_entries=5000, ttl_seconds=6 * 3600)
+
+# Compressed resumes by hash of the full text, kept about as long as an idle session
+_COMPRESSED_RESUME_CACHE = TTLCache(max_entries=1024, ttl_seconds=3600)
+
+# Agent state key holding a session's full resume for the read_full_resume tool
+FULL_RESUME_STATE_KEY = "full_resume"
+
+
+def _cached_retrieve(tool: Dict[str, Any], **kwargs: Any) -> Dict[str, Any]:
+    """
+    Run the strands_tools retrieve tool, serving repeated queries from _RETRIEVE_CACHE.
+    
+    Args:
+        tool: Tool use request containing toolUseId and input
+        **kwargs: Additional arguments forwarded to retrieve
+        
+    Returns:
+        Tool result for this tool use
+    """
+    tool_input = dict(tool.get("input") or {})
+    tool_input["text"] = " ".join(str(tool_input.get("text", "")).lower().split())
+    cache_key = _cache_key(json.dumps(tool_input, sort_keys=True, default=str))
+    
+    cached_result = _RETRIEVE_CACHE.get(cache_key)
+    if cached_result is not None:
+        return {**cached_result, "toolUseId": tool["toolUseId"]}
+    
+    result = retrieve.retrieve(tool, **kwargs)
+    if result.get("status") == "success":
+        _RETRIEVE_CACHE.put(cache_key, result)
+    return result
+
+
+# retrieve tool with the same spec as strands_tools.retrieve, backed by the result cache
+cached_retrieve_tool = PythonAgentTool(retrieve.TOOL_SPEC["name"], retrieve.TOOL_SPEC, _cached_retrieve)
+
+
+READ_FULL_RESUME_SPEC = {
+    "name": "read_full_resume",
+    "description": (
+        "Return the user's full resume text. Follow-up turns only include a compressed resume; "
+        "use this when you need details that are not in it."
+    ),
+    "inputSchema": {"json": {"type": "object", "properties": {}}},
+}
+
+
+def _read_full_resume(tool: Dict[str, Any], **kwargs: Any) -> Dict[str, Any]:
+    """
+    Return the full resume stored in the invoking agent's state.
+    
+    Args:
+        tool: Tool use request containing toolUseId
+        **kwargs: Invocation state from Strands, including the invoking agent
+        
+    Returns:
+        Tool result with the resume text, or an error if none was provided
+    """
+    agent = kwargs.get("agent")
+    resume_text = agent.state.get(FULL_RESUME_STATE_KEY) if agent is not None else None
+    if not resume_text:
+        return {
+            "toolUseId": tool["toolUseId"],
+            "status": "error",
+            "content": [{"text": "No resume has been provided in this session."}],
+        }
+    return {"toolUseId": tool["toolUseId"], "status": "success", "content": [{"text": resume_text}]}
+
+
+# Lets session agents read the full resume on demand instead of receiving it every turn
+read_full_resume_tool = PythonAgentTool(READ_FULL_RESUME_SPEC["name"], READ_FULL_RESUME_SPEC, _read_full_resume)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_bedrock_model() -> BedrockModel:
+    """
+    Get the Bedrock model shared by every agent in this process.
+    
+    Sharing one model (and so one boto3 session and client) keeps TLS
+    connections to Bedrock alive across agents and requests.
+    
+    Returns:
+        Shared BedrockModel (prompt caching is set up by SYSTEM_PROMPT_BLOCKS)
+    """
+    return BedrockModel(
+        boto_session=boto3.Session(),
+        boto_client_config=BEDROCK_CLIENT_CONFIG,
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _get_summary_model() -> BedrockModel:
+    """Get the shared Bedrock model used for conversation summaries."""
+    return BedrockModel(
+        model_id=SUMMARY_MODEL_ID,
+        boto_session=boto3.Session(),
+        boto_client_config=BEDROCK_CLIENT_CONFIG,
+    )
+
+
+class SummarizingWindowManager(SlidingWindowConversationManager):
+    """
+    Sliding window conversation manager that summarizes instead of discarding.
+    
+    Once a session holds more than max_turns user turns, summarize_async folds
+    the oldest turns into a short summary carried at the start of the first
+    kept turn, so the prefill sent to Bedrock stays small without losing the
+    user's background. Summaries run as background tasks scheduled once a
+    response has streamed; the synchronous apply_management hook only does
+    plain sliding-window trimming, which is also all that happens after a
+    summary fails.
+    """
+    
+    def __init__(self, max_turns: int = 6, summary_max_words: int = 300, window_size: int = 20):
+        """
+        Initialize the manager.
+        
+        Args:
+            max_turns: Number of user turns (with their tool calls and replies) kept verbatim
+            summary_max_words: Word budget for the summary of older turns
+            window_size: Hard cap on messages, enforced by plain trimming
+        """
+        super().__init__(window_size=window_size)
+        self.max_turns = max_turns
+        self.summary_max_words = summary_max_words
+        # In-flight summary task (the reference keeps it from being garbage collected)
+        self._summary_task: Optional[asyncio.Task] = None
+        self._summary_failed = False
+    
+    def schedule_summary(self, agent: Agent) -> None:
+        """
+        Start summarizing in the background, unless a summary is already running
+        or one has failed for this session.
+        
+        Args:
+            agent: Agent whose conversation is managed
+        """
+        if self._summary_failed or (self._summary_task is not None and not self._summary_task.done()):
+            return
+        self._summary_task = asyncio.create_task(self.summarize_async(agent))
+    
+    async def summarize_async(self, agent: Agent) -> None:
+        """
+        Fold all but the last max_turns user turns into a summary.
+        
+        Args:
+            agent: Agent whose conversation is managed
+        """
+        messages = agent.messages
+        # A turn starts at each user message with text; tool results are also user messages
+        turn_starts = [
+            index for index, message in enumerate(messages)
+            if message["role"] == "user" and any("text" in content for content in message.get("content", ()))
+        ]
+        # Keep at most half the window verbatim, so the next turn can't overflow into plain trimming
+        keep = min(self.max_turns, len(turn_starts))
+        while keep > 1 and len(messages) - turn_starts[-keep] > self.window_size // 2:
+            keep -= 1
+        if len(turn_starts) <= keep:
+            return
+        
+        split = turn_starts[-keep]
+        first_kept = messages[split]
+        try:
+            summary = await self._summarize(messages[:split])
+        except Exception as e:
+            # Don't retry (and pay for a failing call) on every later turn
+            self._summary_failed = True
+            print(f"Conversation summary failed, falling back to sliding window: {str(e)}")
+            return
+        
+        # Another request may have changed the history while the summary was generated
+        if split >= len(messages) or messages[split] is not first_kept:
+            return
+        
+        # Bedrock needs alternating roles, so the summary joins the first kept user message
+        first_kept["content"] = [
+            {"text": f"Session memory (summary of earlier conversation):\n{summary}"},
+            *first_kept["content"],
+        ]
+        del messages[:split]
+        self.removed_message_count += split
+    
+    async def _summarize(self, messages: List[Dict[str, Any]]) -> str:
+        """
+        Summarize messages with the summary model.
+        
+        Args:
+            messages: Messages to summarize
+            
+        Returns:
+            Summary text
+        """
+        transcript = []
+        for message in messages:
+            for content in message.get("content", ()):
+                if "text" in content:
+                    transcript.append(f"{message['role']}: {content['text'][:2000]}")
+                elif "toolUse" in content:
+                    query = content["toolUse"].get("input", {}).get("text", "")
+                    transcript.append(f"{message['role']}: [searched jobs for: {query}]")
+        
+        summarizer = Agent(
+            model=_get_summary_model(),
+            system_prompt=SUMMARY_PROMPT.format(max_words=self.summary_max_words),
+            callback_handler=None,
+        )
+        result = await summarizer.invoke_async("\n".join(transcript))
+        return str(result).strip()
+
+
 class JobSearchAgent:
     """
     Career Job Search Agent that uses retrieve function tooling to search knowledge bases.
@@ -19,8 +391,24 @@ class JobSearchAgent:
     Supports session-based conversation management for maintaining context across interactions.
     """
     
-    # Class-level dictionary to store agents by session_id
-    _session_agents: Dict[str, Agent] = {}
+    # Instances only hold these two attributes; class-level caches below are unaffected
+    __slots__ = ("agent", "session_id")
+    
+    # Upper bound on cached session agents and idle time before a session expires
+    MAX_SESSIONS = 1000
+    SESSION_TTL_SECONDS = 3600
+    
+    # Class-level LRU of agents by session_id (least recently used first)
+    _session_agents: "OrderedDict[str, Agent]" = OrderedDict()
+    
+    # Last access time (monotonic seconds) for each cached session
+    _session_last_used: Dict[str, float] = {}
+    
+    # Idle stateless agents that can be reused by requests without a session_id
+    _stateless_agents: List[Agent] = []
+    
+    # Guards the session LRU and the stateless agent pool
+    _lock = threading.Lock()
     
     def __init__(self, session_id: Optional[str] = None):
         """
@@ -35,42 +423,93 @@ class JobSearchAgent:
         
         if session_id:
             # Use or create session-specific agent
-            if session_id not in self._session_agents:
-                self._session_agents[session_id] = self._create_agent()
-            self.agent = self._session_agents[session_id]
+            with self._lock:
+                now = time.monotonic()
+                self._evict_expired_sessions(now)
+                if session_id in self._session_agents:
+                    self._session_agents.move_to_end(session_id)
+                else:
+                    self._session_agents[session_id] = self._create_agent(with_session=True)
+                    # Drop least recently used sessions beyond the size limit
+                    while len(self._session_agents) > self.MAX_SESSIONS:
+                        evicted_id, _ = self._session_agents.popitem(last=False)
+                        self._session_last_used.pop(evicted_id, None)
+                self._session_last_used[session_id] = now
+                self.agent = self._session_agents[session_id]
         else:
-            # Create a new stateless agent for single-use
-            self.agent = self._create_agent()
-    
-    def _create_agent(self) -> Agent:
-        """Create a new Agent instance with conversation management."""
-        # Create conversation manager with reasonable window size
-        conversation_manager = SlidingWindowConversationManager(
-            window_size=20  # Keep last 20 message pairs (40 total messages)
-        )
+            # Reuse an idle stateless agent instead of building a new one per request
+            self.agent = self._acquire_stateless_agent()
+    
+    @classmethod
+    def _evict_expired_sessions(cls, now: float) -> None:
+        """Remove sessions idle for longer than SESSION_TTL_SECONDS. Caller must hold _lock."""
+        cutoff = now - cls.SESSION_TTL_SECONDS
+        # Sessions are kept in LRU order, so expired ones are at the front
+        while cls._session_agents:
+            oldest_id = next(iter(cls._session_agents))
+            if cls._session_last_used.get(oldest_id, now) > cutoff:
+                break
+            cls._session_agents.popitem(last=False)
+            cls._session_last_used.pop(oldest_id, None)
+    
+    @classmethod
+    def _acquire_stateless_agent(cls) -> Agent:
+        """Take an idle stateless agent from the pool, creating one if none is free."""
+        with cls._lock:
+            if cls._stateless_agents:
+                return cls._stateless_agents.pop()
+        return cls._create_agent()
+    
+    @classmethod
+    def warm_up(cls) -> None:
+        """
+        Pre-build a stateless agent so the first request does not pay
+        Agent construction latency.
+        """
+        agent = cls._create_agent()
+        with cls._lock:
+            cls._stateless_agents.append(agent)
+    
+    def release(self, reusable: bool = True) -> None:
+        """
+        Return a stateless agent to the shared pool once the request is done.
+        The conversation and per-invocation metrics (traces hold the model
+        messages) are reset, so nothing leaks or accumulates between requests.
+        Session agents are left untouched.
+        
+        Args:
+            reusable: False if the agent's invocation did not run to completion
+                      (e.g. the client disconnected); such agents are discarded
+        """
+        if self.session_id or not reusable:
+            return
+        self.agent.messages.clear()
+        self.agent.event_loop_metrics = EventLoopMetrics()
+        self.agent.conversation_manager.removed_message_count = 0
+        with self._lock:
+            self._stateless_agents.append(self.agent)
+    
+    @staticmethod
+    def _create_agent(with_session: bool = False) -> Agent:
+        """
+        Create a new Agent instance with conversation management.
+        
+        Args:
+            with_session: Whether the agent serves a session; session agents also
+                          get the read_full_resume tool and a summarizing window
+        """
+        if with_session:
+            # Keep the last 6 user turns verbatim and fold older ones into a summary
+            conversation_manager = SummarizingWindowManager(max_turns=6)
+        else:
+            # Stateless history is cleared after every request, so there is nothing to summarize
+            conversation_manager = SlidingWindowConversationManager(window_size=20)
         
         return Agent(
-            tools=[retrieve],
+            model=_get_bedrock_model(),
+            tools=[cached_retrieve_tool, read_full_resume_tool] if with_session else [cached_retrieve_tool],
             conversation_manager=conversation_manager,
-            system_prompt=(
-                "You are a Career Job Search Agent for all fields/seniority.\n"
-                "Available Tools:\n"
-                "- retrieve: Query job information from Knowledge Base\n\n"
-                "Resume Processing:\n"
-                "When user provides resume text directly, analyze the content to understand skills, experience, education, and career trajectory.\n"
-                "Use this information to craft targeted job search queries.\n\n"
-                "Workflow:\n"
-                "1) Resume Analysis: If resume text provided, analyze background and extract key skills/experience\n"
-                "2) Company Recommendations: From resume keywords/interests, list 6–12 relevant companies (top‑tier + mission‑aligned). For each: Company — Why fit (1 line) — Careers URL.\n"
-                "3) Job Search: Use retrieve function to query job information from Knowledge Base. Compose strong queries from resume skills/titles/domains and constraints. Output bullets: Title — Company — Location — Link — 1‑line rationale.\n"
-                "4) Next Steps: Suggest concrete actions (tailoring, outreach/referrals, interview prep) and ask ONE precise follow‑up.\n\n"
-                "Context Continuity:\n"
-                "Remember previous conversations in this session. Reference earlier discussions about user's background, preferences, and job search progress.\n"
-                "Build upon previous recommendations and avoid repeating the same suggestions unless specifically requested.\n\n"
-                "Style: concise, bullet‑first, official links, recent postings only; group and rank best matches first.\n"
-                "Tool usage: Use retrieve for job search; degrade gracefully if tools unavailable.\n"
-                "Safety: No chain‑of‑thought; concise reasoning only; use only user‑provided information and resume content."
-            )
+            system_prompt=SYSTEM_PROMPT_BLOCKS
         )
     
 
@@ -91,15 +530,19 @@ class JobSearchAgent:
         Clear the conversation history for the current session.
         This removes the session from memory entirely.
         """
-        if self.session_id and self.session_id in self._session_agents:
-            del self._session_agents[self.session_id]
+        with self._lock:
+            if self.session_id and self.session_id in self._session_agents:
+                del self._session_agents[self.session_id]
+                self._session_last_used.pop(self.session_id, None)
     
     @classmethod
     def clear_all_sessions(cls) -> None:
         """
         Clear all active sessions. Useful for memory management.
         """
-        cls._session_agents.clear()
+        with cls._lock:
+            cls._session_agents.clear()
+            cls._session_last_used.clear()
     
     @classmethod
     def get_active_sessions(cls) -> list:
@@ -109,7 +552,9 @@ class JobSearchAgent:
         Returns:
             List of active session IDs
         """
-        return list(cls._session_agents.keys())
+        with cls._lock:
+            cls._evict_expired_sessions(time.monotonic())
+            return list(cls._session_agents.keys())
     
     def get_session_info(self) -> Dict[str, Any]:
         """
@@ -127,6 +572,171 @@ class JobSearchAgent:
 
 
 
+def _compress_resume(resume_text: str) -> str:
+    """
+    Reduce a resume to its job-relevant content for follow-up turns.
+    
+    Drops the references, interests and hobbies sections, collapses
+    whitespace, and truncates the result on a line boundary. Everything
+    else, including sections with unrecognised headings, is kept. Results
+    are cached by a hash of the resume.
+    
+    Args:
+        resume_text: Full resume text
+        
+    Returns:
+        Compressed resume text
+    """
+    cache_key = _cache_key(resume_text)
+    compressed = _COMPRESSED_RESUME_CACHE.get(cache_key)
+    if compressed is None:
+        compressed = _extract_resume_sections(resume_text)
+        _COMPRESSED_RESUME_CACHE.put(cache_key, compressed)
+    return compressed
+
+
+def _extract_resume_sections(resume_text: str) -> str:
+    """
+    Drop the non-job-relevant sections of a resume and truncate the rest.
+    
+    Args:
+        resume_text: Full resume text
+        
+    Returns:
+        Compressed resume text
+    """
+    kept_lines = []
+    dropping = False
+    for raw_line in resume_text.splitlines():
+        line = " ".join(raw_line.split())
+        if not line:
+            continue
+        if _RESUME_DROP_HEADING_RE.match(line):
+            dropping = True
+            continue
+        if dropping:
+            # A dropped section ends at the next heading-like line: a few capitalized words
+            words = line.rstrip(":").split()
+            if (len(words) > 4 or not _RESUME_ANY_HEADING_RE.match(line)
+                    or not all(word[0].isupper() or word.lower() in _RESUME_HEADING_JOINERS for word in words)):
+                continue
+            dropping = False
+        kept_lines.append(line)
+    
+    compressed = "\n".join(kept_lines)
+    if len(compressed) > MAX_COMPRESSED_RESUME_CHARS:
+        cut = compressed.rfind("\n", 0, MAX_COMPRESSED_RESUME_CHARS)
+        compressed = compressed[:cut if cut > 0 else MAX_COMPRESSED_RESUME_CHARS]
+    return compressed
+
+
+def _response_cache_key(prompt: str, resume_text: Optional[str]) -> str:
+    """
+    Build the response cache key for a stateless request.
+    
+    The prompt is case/whitespace-normalized and hashed together with the
+    resume, so a cached answer is only ever replayed for the same resume.
+    
+    Args:
+        prompt: User prompt text
+        resume_text: Optional resume text
+        
+    Returns:
+        Cache key string
+    """
+    normalized_prompt = " ".join(prompt.lower().split())
+    return _cache_key(f"{resume_text or ''}\x00{normalized_prompt}")
+
+
+def _validate_payload(payload: Any) -> Tuple[str, Optional[str], Optional[str]]:
+    """
+    Validate a request payload before any agent is acquired.
+    
+    Args:
+        payload: Decoded request payload
+        
+    Returns:
+        Tuple of (prompt, resume_text, session_id)
+        
+    Raises:
+        ValueError: If the payload is malformed or exceeds the size limits
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("Error: payload must be a JSON object.")
+    
+    prompt = payload.get("prompt")
+    resume_text = payload.get("resume_text")
+    session_id = payload.get("session_id")
+    
+    if not prompt or not isinstance(prompt, str):
+        raise ValueError("Error: 'prompt' is required.")
+    if len(prompt) > MAX_PROMPT_CHARS:
+        raise ValueError(f"Error: 'prompt' exceeds {MAX_PROMPT_CHARS} characters.")
+    if resume_text is not None and not isinstance(resume_text, str):
+        raise ValueError("Error: 'resume_text' must be a string.")
+    if resume_text and len(resume_text) > MAX_RESUME_CHARS:
+        raise ValueError(f"Error: 'resume_text' exceeds {MAX_RESUME_CHARS} characters.")
+    if session_id is not None and not isinstance(session_id, str):
+        raise ValueError("Error: 'session_id' must be a string.")
+    
+    return prompt, resume_text, session_id
+
+
+async def _stream_agent_events(agent: Agent, prompt: Any):
+    """
+    Translate raw Strands stream events into the client-facing event format.
+    
+    Args:
+        agent: Strands Agent to invoke
+        prompt: User prompt as text or a list of content blocks
+        
+    Yields:
+        Event dictionaries with thinking, response, tool or error details,
+        followed by the final complete response
+    """
+    # Stream the response with clean, useful events. Each branch is a single
+    # dict probe; Strands events carry several keys, so the order matters.
+    final_response = ""
+    # Close the Strands stream as soon as this generator is closed, so its cleanup
+    # runs before the agent is released rather than whenever it is garbage collected
+    async with contextlib.aclosing(agent.stream_async(prompt)) as stream:
+        async for event in stream:
+            # Real-time text generation (thinking process)
+            data = event.get("data")
+            if data is not None:
+                yield {"thinking": data}
+                continue
+            
+            # Complete formatted responses 
+            message = event.get("message")
+            if isinstance(message, dict):
+                for content in message.get("content", ()):
+                    text = content.get("text")
+                    if text is not None:
+                        yield {"response": text}
+                        # Keep track of the final complete response
+                        final_response = text
+                continue
+            
+            # Tool usage information - show the streaming tool input being built
+            tool_info = event.get("current_tool_use")
+            if tool_info is not None:
+                if "name" in tool_info:
+                    tool_data = {"tool_name": tool_info["name"]}
+                    if "input" in tool_info:
+                        tool_data["tool_input"] = tool_info["input"]
+                    yield tool_data
+                continue
+            
+            # Error events
+            if "error" in event:
+                yield {"error": event["error"]}
+    
+    # Yield the final complete response at the end
+    if final_response:
+        yield {"final_result": final_response}
+
+
 async def handle_agent_request(payload):
     """
     Handle agent request from AWS Bedrock Agent Runtime with session support.
@@ -144,68 +754,84 @@ async def handle_agent_request(payload):
     Yields:
         Streaming response chunks from the agent
     """
-    # Parse payload if it's a string
-    if isinstance(payload, str):
+    # AgentCore already decodes the JSON body; string payloads are only parsed in compatibility mode
+    if ACCEPT_TEXT_PAYLOADS and isinstance(payload, str):
         try:
             payload = json.loads(payload)
         except json.JSONDecodeError:
             # If it's just a plain text prompt
             payload = {"prompt": payload}
     
-    # Extract components from payload
-    prompt = payload.get("prompt")
-    resume_text = payload.get("resume_text")
-    session_id = payload.get("session_id")
-    
-    if not prompt:
-        yield {"error": "Error: 'prompt' is required."}
+    # Reject malformed or oversized requests before touching an agent
+    try:
+        prompt, resume_text, session_id = _validate_payload(payload)
+    except ValueError as e:
+        yield {"error": str(e)}
         return
     
+    # Stateless answers depend only on prompt and resume, so repeat questions are served from cache
+    cache_key = None
+    if not session_id:
+        cache_key = _response_cache_key(prompt, resume_text)
+        cached_events = _RESPONSE_CACHE.get(cache_key)
+        if cached_events is not None:
+            for event in cached_events:
+                yield event
+            return
+    
+    agent = None
+    completed = False
     try:
-        # Create agent with or without session
+        # Get agent with or without session (stateless agents come from a shared pool)
         agent = JobSearchAgent(session_id=session_id)
         
         # Add resume to prompt if provided
-        if resume_text:
+        if resume_text and not session_id:
+            # Stateless requests start from an empty history, so a cache point after
+            # the resume lets repeat requests with the same resume reuse the prefix.
+            # Session turns are kept in history, where cache points would pile up.
+            prompt = [
+                {"text": f"Users Resume: {resume_text}"},
+                {"cachePoint": {"type": "default"}},
+                {"text": prompt},
+            ]
+        elif resume_text:
+            # The first turn carries the full resume; follow-ups only carry the compressed,
+            # job-relevant sections, since older turns may be folded into a summary. The full
+            # text stays in agent state for the read_full_resume tool.
+            agent.agent.state.set(FULL_RESUME_STATE_KEY, resume_text)
+            if agent.agent.messages:
+                resume_text = _compress_resume(resume_text)
             prompt += f"\n\nUsers Resume: {resume_text}"
         
-        # Stream the response with clean, useful events
-        final_response = ""
-        async for event in agent.agent.stream_async(prompt):
-            # Real-time text generation (thinking process)
-            if "data" in event:
-                yield {"thinking": event["data"]}
-            
-            # Complete formatted responses 
-            elif "message" in event and isinstance(event["message"], dict):
-                if "content" in event["message"]:
-                    for content in event["message"]["content"]:
-                        if "text" in content:
-                            yield {"response": content["text"]}
-                            # Keep track of the final complete response
-                            final_response = content["text"]
-            
-            # Tool usage information - show the streaming tool input being built
-            elif "current_tool_use" in event:
-                tool_info = event["current_tool_use"]
-                if "name" in tool_info:
-                    tool_data = {"tool_name": tool_info["name"]}
-                    if "input" in tool_info:
-                        tool_data["tool_input"] = tool_info["input"]
-                    yield tool_data
-            
-            # Error events
-            elif "error" in event:
-                yield {"error": event["error"]}
+        # Stream the response, recording events so stateless answers can be replayed
+        recorded_events: List[Dict[str, Any]] = []
+        cacheable = cache_key is not None
+        async with contextlib.aclosing(_stream_agent_events(agent.agent, prompt)) as events:
+            async for event in events:
+                if "error" in event:
+                    cacheable = False
+                elif cacheable:
+                    recorded_events.append(event)
+                yield event
+        completed = True
+        
+        # Summarize old session turns in the background, so the stream can close right away
+        conversation_manager = agent.agent.conversation_manager
+        if isinstance(conversation_manager, SummarizingWindowManager):
+            conversation_manager.schedule_summary(agent.agent)
         
-        # Yield the final complete response at the end
-        if final_response:
-            yield {"final_result": final_response}
+        if cacheable and recorded_events:
+            _RESPONSE_CACHE.put(cache_key, recorded_events)
             
     except Exception as e:
         error_msg = f"Error processing request: {str(e)}"
         print(error_msg)
         yield {"error": error_msg}
+    finally:
+        # The stream is closed by now; an agent whose invocation was cut short is not pooled
+        if agent is not None:
+            agent.release(reusable=completed)
 
 
 
@@ -228,4 +854,5 @@ async def invoke(payload: Dict[str, Any]):
         yield event
 
 if __name__ == "__main__":
+	JobSearchAgent.warm_up()
 	app.run()
\ No newline at end of file
@@ -1,158 +1,432 @@
 import json
 import boto3
+import concurrent.futures
+import functools
+import hashlib
 import logging
 import os
+import random
+import time
+from dataclasses import dataclass
 from typing import Dict, Any
 import urllib3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from urllib3.util import Timeout
+
+# orjson is optional; fall back to the stdlib encoder if it isn't bundled
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# Initialize HTTP client for CloudFormation responses
-http = urllib3.PoolManager()
+# Initialize HTTP client for CloudFormation responses. Retries are done by send_response
+# alone, so every attempt can be bounded by the invocation's remaining time.
+http = urllib3.PoolManager(maxsize=4, retries=False)
+
+# Per-attempt connect/read timeouts for the CloudFormation response PUT
+RESPONSE_CONNECT_TIMEOUT_SECONDS = 2.0
+RESPONSE_READ_TIMEOUT_SECONDS = 5.0
+
+# Pauses between CloudFormation response attempts (None marks the last attempt), and the time
+# to keep free before the Lambda timeout so an attempt can never run into it
+_RESPONSE_RETRY_BACKOFF = (0.25, 0.5, 1, 2, None)
+RESPONSE_RESERVE_MILLIS = 2000
+
+
+# Shared botocore config: keep TCP connections alive between warm invocations
+BOTO_CONFIG = Config(
+    tcp_keepalive=True,
+    max_pool_connections=10,
+    retries={'mode': 'adaptive', 'max_attempts': 5}
+)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_session() -> boto3.session.Session:
+    """Get the boto3 session shared by all clients, so service models and endpoint data load once"""
+    return boto3.session.Session()
+
+
+@functools.lru_cache(maxsize=None)
+def get_client(service_name: str):
+    """Get a boto3 client, created once per container and reused across warm invocations"""
+    return _get_session().client(service_name, config=BOTO_CONFIG)
+
+
+# Background worker for side tasks that can overlap the runtime API calls
+_EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+
+# Longest the Create path waits for X-Ray configuration after the runtime is created
+XRAY_CONFIG_TIMEOUT_SECONDS = 10
+
+# Error codes X-Ray returns when a destination change is already in progress
+_XRAY_PENDING_ERROR_CODES = ('ConflictException', 'ValidationException', 'InvalidRequestException')
+
+# Set once X-Ray has been seen routing to CloudWatchLogs; it stays that way for the container's life
+_XRAY_DEST_OK = False
+
+# Environment variables passed through to the agent runtime. This function's environment
+# doesn't change between warm invocations, so read it once; the API only accepts strings.
+AGENT_ENV_VARS: Dict[str, str] = {
+    'KNOWLEDGE_BASE_ID': os.environ.get('KNOWLEDGE_BASE_ID', ''),
+    'AWS_REGION': os.environ.get('AWS_REGION', 'us-east-1')
+}
 
+# All runtimes are deployed with public networking
+_NETWORK_CONFIG = {'networkMode': 'PUBLIC'}
 
-def create_agent_runtime(client, agent_runtime_name: str, container_uri: str, role_arn: str, knowledge_base_id: str, aws_region: str, context):
-    """Create an agent runtime"""
-    logger.info(f"Creating agent runtime: {agent_runtime_name}")
+# Runtime statuses that are still settling after a create or update call, and the healthy one
+_PENDING_STATUSES = ('CREATING', 'UPDATING')
+_READY_STATUS = 'READY'
+
+# Delays between status polls while a runtime is settling, and the total wait budget.
+# Each delay gets up to _BACKOFF_JITTER seconds added so concurrent stacks don't poll in lockstep.
+_BACKOFF = (0.5, 1, 2, 4, 8, 10, 10, 10, 10, 10)
+_BACKOFF_JITTER = 0.25
+RUNTIME_SETTLE_TIMEOUT_SECONDS = 60
+
+# Time kept free at the end of an invocation for the X-Ray wait and the CloudFormation response
+INVOCATION_RESERVE_SECONDS = 15
+
+# Runtime name -> runtime ID, remembered across warm invocations of this container
+_RUNTIME_ID_CACHE: Dict[str, str] = {}
+
+
+# Runtime ID -> hash of the spec last applied to it from this container
+_LAST_APPLIED: Dict[str, str] = {}
+
+
+@dataclass(slots=True, frozen=True)
+class RuntimeSpec:
+    """Parameters for one agent runtime, extracted once per event"""
+    name: str
+    container_uri: str
+    role_arn: str
+    environment_variables: Dict[str, str]
     
-    # Prepare environment variables for the agent runtime
-    agent_env_vars = {
-        'KNOWLEDGE_BASE_ID': knowledge_base_id,
-        'AWS_REGION': aws_region
+    @classmethod
+    def from_properties(cls, resource_properties: Dict[str, Any]) -> 'RuntimeSpec':
+        """Build the spec from the custom resource properties and this function's environment"""
+        return cls(
+            name=resource_properties['AgentRuntimeName'],
+            container_uri=resource_properties['ContainerUri'],
+            role_arn=resource_properties['RoleArn'],
+            environment_variables=AGENT_ENV_VARS
+        )
+
+
+def _is_not_found(error: Exception) -> bool:
+    """Check whether an AWS error is a ResourceNotFoundException, by error code rather than message text"""
+    return isinstance(error, ClientError) and error.response.get('Error', {}).get('Code') == 'ResourceNotFoundException'
+
+
+def _spec_hash(runtime_spec: Dict[str, Any]) -> str:
+    """Hash a runtime spec (container, role, network, env vars) for change detection"""
+    return hashlib.blake2b(json.dumps(runtime_spec, sort_keys=True).encode('utf-8'), digest_size=16).hexdigest()
+
+
+def _runtime_matches_spec(client, agent_runtime_id: str, runtime_spec: Dict[str, Any]) -> bool:
+    """Check whether the deployed runtime is READY and already has the given spec"""
+    try:
+        current = client.get_agent_runtime(agentRuntimeId=agent_runtime_id)
+    except Exception as get_error:
+        logger.warning("Could not describe agent runtime %s, updating anyway: %s", agent_runtime_id, get_error)
+        return False
+    
+    # A runtime whose last update failed (or is still in flight) needs the spec re-applied
+    if current.get('status') != _READY_STATUS:
+        logger.info("Agent runtime %s is %s, not skipping the update", agent_runtime_id, current.get('status'))
+        return False
+    
+    current_spec = {
+        'containerUri': current.get('agentRuntimeArtifact', {}).get('containerConfiguration', {}).get('containerUri'),
+        'roleArn': current.get('roleArn'),
+        'networkMode': current.get('networkConfiguration', {}).get('networkMode'),
+        'environmentVariables': current.get('environmentVariables') or {}
     }
-    logger.info(f"Passing environment variables to agent runtime: {agent_env_vars}")
+    return current_spec == runtime_spec
+
+
+def _iter_runtime_pages(client):
+    """Yield the list of agent runtimes on each page of list_agent_runtimes"""
+    paginator = client.get_paginator('list_agent_runtimes')
+    for page in paginator.paginate(PaginationConfig={'PageSize': 100}):
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("List agent runtimes page: %s", page)
+        yield page.get('agentRuntimes', ())
+
+
+def _find_runtime_id(client, agent_runtime_name: str):
+    """Find the ID of the runtime with this name, falling back to the first ID prefix match"""
+    # Runtime IDs are the runtime name plus a generated suffix
+    id_prefix = agent_runtime_name + '-'
+    prefix_match = None
+    for runtimes in _iter_runtime_pages(client):
+        # Exact name match is a single hash probe per page and ends the scan
+        ids_by_name = {runtime.get('agentRuntimeName'): runtime.get('agentRuntimeId') for runtime in runtimes}
+        if agent_runtime_name in ids_by_name:
+            return ids_by_name[agent_runtime_name]
+        
+        # Remember the first ID prefix match in case no runtime has the exact name
+        if prefix_match is None:
+            prefix_match = next(
+                (
+                    runtime['agentRuntimeId']
+                    for runtime in runtimes
+                    if runtime.get('agentRuntimeId', '').startswith(id_prefix)
+                ),
+                None
+            )
+    return prefix_match
+
+
+def _resolve_runtime_id(client, agent_runtime_name: str):
+    """Resolve a runtime name to its ID, checking the container cache before listing runtimes"""
+    agent_runtime_id = _RUNTIME_ID_CACHE.get(agent_runtime_name)
+    if agent_runtime_id:
+        logger.info("Using cached runtime ID: %s", agent_runtime_id)
+        return agent_runtime_id
+    
+    logger.info("Attempting to find agent runtime by listing all runtimes")
+    agent_runtime_id = _find_runtime_id(client, agent_runtime_name)
+    if agent_runtime_id:
+        logger.info("Found matching runtime ID: %s", agent_runtime_id)
+        _RUNTIME_ID_CACHE[agent_runtime_name] = agent_runtime_id
+    return agent_runtime_id
+
+
+def _container_artifact(container_uri: str) -> Dict[str, Any]:
+    """Build the agentRuntimeArtifact for a container image"""
+    return {'containerConfiguration': {'containerUri': container_uri}}
+
+class RuntimeFailedError(Exception):
+    """Raised when an agent runtime settles in a *_FAILED status"""
+    
+    def __init__(self, agent_runtime_id: str, status: str, reason: str = None):
+        super().__init__(f"Agent runtime {agent_runtime_id} is {status}" + (f": {reason}" if reason else ""))
+        self.agent_runtime_id = agent_runtime_id
+        self.status = status
+
+
+class RuntimeCreateError(Exception):
+    """Raised when a runtime was created but did not settle; carries the new runtime's ID"""
+    
+    def __init__(self, agent_runtime_id: str, cause: Exception):
+        super().__init__(str(cause))
+        self.agent_runtime_id = agent_runtime_id
+
+
+def _wait_for_runtime_settled(client, agent_runtime_id: str, status: str, context):
+    """
+    Poll the runtime with backoff while it is CREATING/UPDATING; returns the last status seen.
+    Raises RuntimeFailedError if the runtime ends up in a *_FAILED status.
+    """
+    # The status from the create/update response stands in for the first poll, so a runtime
+    # that is already settled costs no sleep and no extra API call
+    if status not in _PENDING_STATUSES:
+        if status and status.endswith('_FAILED'):
+            raise RuntimeFailedError(agent_runtime_id, status)
+        return status
+    
+    # Never wait into the time needed to respond, or CloudFormation hangs until its own timeout
+    budget = RUNTIME_SETTLE_TIMEOUT_SECONDS
+    if context is not None:
+        budget = min(budget, context.get_remaining_time_in_millis() / 1000 - INVOCATION_RESERVE_SECONDS)
+    deadline = time.monotonic() + budget
+    for delay in _BACKOFF:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        time.sleep(min(delay + random.uniform(0, _BACKOFF_JITTER), remaining))
+        current = client.get_agent_runtime(agentRuntimeId=agent_runtime_id)
+        status = current.get('status')
+        if status not in _PENDING_STATUSES:
+            logger.info("Agent runtime %s settled with status: %s", agent_runtime_id, status)
+            if status and status.endswith('_FAILED'):
+                raise RuntimeFailedError(agent_runtime_id, status, current.get('failureReason'))
+            return status
+    
+    logger.warning("Agent runtime %s still %s after waiting up to %.1fs, continuing", agent_runtime_id, status, max(budget, 0))
+    return status
+
+def create_agent_runtime(client, spec: RuntimeSpec, context):
+    """Create an agent runtime and return its ID"""
+    logger.info("Creating agent runtime: %s", spec.name)
+    logger.info("Passing environment variables to agent runtime: %s", spec.environment_variables)
     
     # Call the CreateAgentRuntime operation
     response = client.create_agent_runtime(
-        agentRuntimeName=agent_runtime_name,
-        agentRuntimeArtifact={
-            'containerConfiguration': {
-                'containerUri': container_uri
-            }
-        },
-        networkConfiguration={"networkMode": "PUBLIC"},
-        roleArn=role_arn,
-        environmentVariables=agent_env_vars
+        agentRuntimeName=spec.name,
+        agentRuntimeArtifact=_container_artifact(spec.container_uri),
+        networkConfiguration=_NETWORK_CONFIG,
+        roleArn=spec.role_arn,
+        environmentVariables=spec.environment_variables
     )
     
-    logger.info(f"Create agent runtime API response: {response}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Create agent runtime API response: %s", response)
     
     # Extract ARN and ID from response for logging
     agent_runtime_id = response.get('agentRuntimeId')
     agent_runtime_arn = response.get('agentRuntimeArn')
     
-    logger.info(f"Agent runtime created - ARN: {agent_runtime_arn}, ID: {agent_runtime_id}")
+    logger.info("Agent runtime created - ARN: %s, ID: %s", agent_runtime_arn, agent_runtime_id)
+    
+    # Remember the new ID so a following Update/Delete can skip the list call
+    if agent_runtime_id:
+        _RUNTIME_ID_CACHE[spec.name] = agent_runtime_id
+        # Only poll if the runtime isn't already ready; a terminal first status returns immediately.
+        # The runtime exists from here on, so a failure must tell the caller which one to clean up.
+        try:
+            _wait_for_runtime_settled(client, agent_runtime_id, response.get('status'), context)
+        except Exception as wait_error:
+            raise RuntimeCreateError(agent_runtime_id, wait_error) from wait_error
+    
+    return agent_runtime_id
+
+def _apply_runtime_update(client, agent_runtime_id: str, spec: RuntimeSpec, context):
+    """Update the runtime with this ID to the spec, skipping the call if nothing material changed"""
+    runtime_spec = {
+        'containerUri': spec.container_uri,
+        'roleArn': spec.role_arn,
+        'networkMode': _NETWORK_CONFIG['networkMode'],
+        'environmentVariables': spec.environment_variables
+    }
+    spec_hash = _spec_hash(runtime_spec)
+    if _LAST_APPLIED.get(agent_runtime_id) == spec_hash:
+        logger.info("No-op update: spec already applied to %s from this container", agent_runtime_id)
+        return agent_runtime_id
+    if _runtime_matches_spec(client, agent_runtime_id, runtime_spec):
+        logger.info("No-op update: agent runtime %s already matches the requested spec", agent_runtime_id)
+        _LAST_APPLIED[agent_runtime_id] = spec_hash
+        return agent_runtime_id
+    
+    # The runtime is about to leave the memoized spec; only a spec verified READY may be remembered
+    _LAST_APPLIED.pop(agent_runtime_id, None)
+    
+    # Call update_agent_runtime API
+    logger.info("Calling update_agent_runtime for ID: %s", agent_runtime_id)
+    update_response = client.update_agent_runtime(
+        agentRuntimeId=agent_runtime_id,
+        agentRuntimeArtifact=_container_artifact(spec.container_uri),
+        roleArn=spec.role_arn,
+        networkConfiguration=_NETWORK_CONFIG,
+        environmentVariables=spec.environment_variables
+    )
+    
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Update agent runtime API response: %s", update_response)
+    
+    # Extract updated information for logging
+    updated_arn = update_response.get('agentRuntimeArn')
+    updated_version = update_response.get('agentRuntimeVersion')
+    updated_status = update_response.get('status')
+    
+    logger.info("Agent runtime updated successfully - ARN: %s, Version: %s, Status: %s", updated_arn, updated_version, updated_status)
+    # Only remember the spec once the runtime is known to be running it
+    if _wait_for_runtime_settled(client, agent_runtime_id, updated_status, context) == _READY_STATUS:
+        _LAST_APPLIED[agent_runtime_id] = spec_hash
+    return agent_runtime_id
 
-def update_agent_runtime(client, agent_runtime_name: str, container_uri: str, role_arn: str, knowledge_base_id: str, aws_region: str, context):
-    """Update an existing agent runtime using the update API"""
-    logger.info(f"Updating agent runtime: {agent_runtime_name}")
+def update_agent_runtime(client, spec: RuntimeSpec, context):
+    """Update an existing agent runtime using the update API and return its ID"""
+    logger.info("Updating agent runtime: %s", spec.name)
     
     try:
         # Find the agent runtime ID first
         logger.info("Finding agent runtime ID for update")
-        list_response = client.list_agent_runtimes()
-        
-        agent_runtime_id = None
-        for runtime in list_response.get('agentRuntimes', []):
-            runtime_name = runtime.get('agentRuntimeName', '')
-            runtime_id = runtime.get('agentRuntimeId', '')
-            
-            if runtime_name == agent_runtime_name or runtime_id.startswith(agent_runtime_name):
-                agent_runtime_id = runtime_id
-                logger.info(f"Found runtime ID for update: {agent_runtime_id}")
-                break
+        from_cache = spec.name in _RUNTIME_ID_CACHE
+        agent_runtime_id = _resolve_runtime_id(client, spec.name)
         
         if not agent_runtime_id:
-            logger.info(f"Agent runtime {agent_runtime_name} not found for update, will create new one instead")
-            # Fall back to creating a new runtime
-            create_agent_runtime(client, agent_runtime_name, container_uri, role_arn, knowledge_base_id, aws_region, context)
-            return
-        
-        # Prepare environment variables
-        agent_env_vars = {
-            'KNOWLEDGE_BASE_ID': knowledge_base_id,
-            'AWS_REGION': aws_region
-        }
+            logger.info("Agent runtime %s not found for update, will create new one instead", spec.name)
+            # Fall back to creating a new runtime; it caches the new ID so later events skip the scan
+            return create_agent_runtime(client, spec, context)
         
-        # Call update_agent_runtime API
-        logger.info(f"Calling update_agent_runtime for ID: {agent_runtime_id}")
-        update_response = client.update_agent_runtime(
-            agentRuntimeId=agent_runtime_id,
-            agentRuntimeArtifact={
-                'containerConfiguration': {
-                    'containerUri': container_uri
-                }
-            },
-            roleArn=role_arn,
-            networkConfiguration={"networkMode": "PUBLIC"},
-            environmentVariables=agent_env_vars
-        )
-        
-        logger.info(f"Update agent runtime API response: {update_response}")
-        
-        # Extract updated information for logging
-        updated_arn = update_response.get('agentRuntimeArn')
-        updated_version = update_response.get('agentRuntimeVersion')
-        updated_status = update_response.get('status')
+        try:
+            return _apply_runtime_update(client, agent_runtime_id, spec, context)
+        except ClientError as update_error:
+            if not (from_cache and _is_not_found(update_error)):
+                raise
         
-        logger.info(f"Agent runtime updated successfully - ARN: {updated_arn}, Version: {updated_version}, Status: {updated_status}")
+        # The cached ID is stale (e.g. runtime deleted and recreated out of band): list once and retry
+        logger.info("Cached runtime ID %s no longer exists, looking %s up again", agent_runtime_id, spec.name)
+        _RUNTIME_ID_CACHE.pop(spec.name, None)
+        _LAST_APPLIED.pop(agent_runtime_id, None)
+        agent_runtime_id = _resolve_runtime_id(client, spec.name)
+        if not agent_runtime_id:
+            logger.info("Agent runtime %s not found for update, will create new one instead", spec.name)
+            return create_agent_runtime(client, spec, context)
+        return _apply_runtime_update(client, agent_runtime_id, spec, context)
         
     except Exception as update_error:
         error_message = str(update_error)
-        logger.error(f"Error updating agent runtime: {error_message}")
+        logger.error("Error updating agent runtime: %s", error_message)
+        # The ID may have gone stale after the lookup; look it up again next time
+        if _is_not_found(update_error):
+            _RUNTIME_ID_CACHE.pop(spec.name, None)
         # Re-raise the exception so the caller can handle it
         raise
 
-def delete_agent_runtime(client, agent_runtime_name: str, context):
-    """Delete an agent runtime by finding it and using its ID"""
-    logger.info(f"Deleting agent runtime: {agent_runtime_name}")
+def _delete_runtime_by_id(client, agent_runtime_id: str) -> bool:
+    """Delete a runtime by ID; returns False if it no longer exists"""
+    logger.info("Attempting to delete agent runtime with ID: %s", agent_runtime_id)
+    try:
+        delete_response = client.delete_agent_runtime(agentRuntimeId=agent_runtime_id)
+    except ClientError as delete_error:
+        if not _is_not_found(delete_error):
+            raise
+        logger.info("Agent runtime %s not found", agent_runtime_id)
+        return False
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Delete agent runtime API response: %s", delete_response)
+    return True
+
+def delete_agent_runtime(client, agent_runtime_name: str, context, agent_runtime_id: str = None):
+    """Delete an agent runtime by its ID, looking the ID up by name when it isn't known"""
+    logger.info("Deleting agent runtime: %s", agent_runtime_name)
     
     try:
-        # Find the agent runtime by listing all runtimes
-        logger.info("Attempting to find agent runtime by listing all runtimes")
-        list_response = client.list_agent_runtimes()
-        logger.info(f"List agent runtimes response: {list_response}")
+        # Prefer the ID recorded in the physical resource ID, then the container cache,
+        # so the runtime can be deleted directly without listing runtimes
+        cached_runtime_id = _RUNTIME_ID_CACHE.pop(agent_runtime_name, None)
+        known_runtime_id = agent_runtime_id or cached_runtime_id
+        if known_runtime_id and _delete_runtime_by_id(client, known_runtime_id):
+            logger.info("Agent runtime %s (ID: %s) deletion initiated", agent_runtime_name, known_runtime_id)
+            return
         
-        # Look for a runtime that matches our agent name
-        runtimes = list_response.get('agentRuntimes', [])
-        agent_runtime_id = None
+        # ID unknown (legacy physical resource ID) or gone (runtime may have been recreated): find it by name
+        agent_runtime_id = _find_runtime_id(client, agent_runtime_name)
         
-        for runtime in runtimes:
-            runtime_name = runtime.get('agentRuntimeName', '')
-            runtime_id = runtime.get('agentRuntimeId', '')
-            logger.info(f"Found runtime - Name: {runtime_name}, ID: {runtime_id}")
-            
-            # Check if this runtime matches our agent name
-            if runtime_name == agent_runtime_name or runtime_id.startswith(agent_runtime_name):
-                agent_runtime_id = runtime_id
-                logger.info(f"Found matching runtime ID: {agent_runtime_id}")
-                break
-        
-        if agent_runtime_id is None:
-            logger.info(f"No matching runtime found for name: {agent_runtime_name}")
+        if agent_runtime_id is None or agent_runtime_id == known_runtime_id:
+            logger.info("No matching runtime found for name: %s", agent_runtime_name)
             return
         
-        # Attempt to delete the agent runtime using the ID
-        logger.info(f"Attempting to delete agent runtime with ID: {agent_runtime_id}")
-        delete_response = client.delete_agent_runtime(agentRuntimeId=agent_runtime_id)
-        logger.info(f"Delete agent runtime API response: {delete_response}")
-        
-        logger.info(f"Agent runtime {agent_runtime_name} (ID: {agent_runtime_id}) deletion initiated")
+        if _delete_runtime_by_id(client, agent_runtime_id):
+            logger.info("Agent runtime %s (ID: %s) deletion initiated", agent_runtime_name, agent_runtime_id)
         
     except Exception as delete_error:
         error_message = str(delete_error)
-        logger.error(f"Error deleting agent runtime: {error_message}")
+        logger.error("Error deleting agent runtime: %s", error_message)
         # Don't fail delete operations - just log the error
 
 
 def configure_xray_trace_destination():
     """Configure X-Ray to use CloudWatch Logs as trace destination for OTLP support"""
+    global _XRAY_DEST_OK
+    if _XRAY_DEST_OK:
+        logger.info("X-Ray destination already verified in this container, skipping")
+        return
+    
     logger.info("Configuring X-Ray trace destination")
     
     try:
-        xray_client = boto3.client('xray')
+        xray_client = get_client('xray')
         
         # First check current destination
         try:
@@ -160,11 +434,12 @@ def configure_xray_trace_destination():
             current_destination = current_response.get('Destination', 'XRay')
             current_status = current_response.get('Status', 'UNKNOWN')
             
-            logger.info(f"Current X-Ray destination: {current_destination}, Status: {current_status}")
+            logger.info("Current X-Ray destination: %s, Status: %s", current_destination, current_status)
             
             # If already set to CloudWatchLogs and active, no need to update
             if current_destination == 'CloudWatchLogs' and current_status == 'ACTIVE':
                 logger.info("X-Ray already configured correctly for CloudWatchLogs")
+                _XRAY_DEST_OK = True
                 return
             
             # If status is PENDING, don't try to update
@@ -173,7 +448,7 @@ def configure_xray_trace_destination():
                 return
                 
         except Exception as get_error:
-            logger.info(f"Could not get current destination (may not exist): {get_error}")
+            logger.info("Could not get current destination (may not exist): %s", get_error)
         
         # Update to CloudWatchLogs
         try:
@@ -184,20 +459,40 @@ def configure_xray_trace_destination():
             new_destination = update_response.get('Destination', 'CloudWatchLogs')
             new_status = update_response.get('Status', 'PENDING')
             
-            logger.info(f"X-Ray destination updated to: {new_destination}, Status: {new_status}")
+            logger.info("X-Ray destination updated to: %s, Status: %s", new_destination, new_status)
             
-        except Exception as update_error:
-            error_msg = str(update_error)
-            logger.warning(f"Failed to update X-Ray destination: {error_msg}")
+        except ClientError as update_error:
+            error = update_error.response.get('Error', {})
+            error_code = error.get('Code')
             
             # If update fails due to pending status, that's okay
-            if 'PENDING' in error_msg:
+            if error_code in _XRAY_PENDING_ERROR_CODES and 'PENDING' in error.get('Message', ''):
                 logger.info("X-Ray update already in progress")
             else:
-                logger.error(f"Failed to update X-Ray destination: {error_msg}")
+                logger.error("Failed to update X-Ray destination (%s): %s", error_code, error.get('Message'))
             
     except Exception as e:
-        logger.error(f"Error configuring X-Ray trace destination: {e}")
+        logger.error("Error configuring X-Ray trace destination: %s", e)
+
+
+# Physical resource ID suffixes that don't carry a runtime ID: 'stable' is the legacy ID
+# (runtime exists, ID unknown); 'pending' means Create never got as far as a runtime
+_STABLE_SUFFIX = 'stable'
+_PENDING_SUFFIX = 'pending'
+
+
+def _physical_resource_id(agent_runtime_name: str, agent_runtime_id: str) -> str:
+    """Build the physical resource ID for a runtime, embedding its runtime ID"""
+    return f"agent-runtime-{agent_runtime_name}-{agent_runtime_id}"
+
+
+def _runtime_id_from_physical_id(physical_resource_id: str, agent_runtime_name: str):
+    """Extract the runtime ID from a physical resource ID, or None for '-stable'/'-pending' IDs"""
+    prefix = f"agent-runtime-{agent_runtime_name}-"
+    if not physical_resource_id or not physical_resource_id.startswith(prefix):
+        return None
+    agent_runtime_id = physical_resource_id[len(prefix):]
+    return agent_runtime_id if agent_runtime_id not in ('', _STABLE_SUFFIX, _PENDING_SUFFIX) else None
 
 
 def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
@@ -206,102 +501,136 @@ def lambda_handler(event: Dict[str, Any], context) -> Dict[str, Any]:
     Supports Create, Update (using versioning), and Delete operations.
     Version: 2.0 - Uses update_agent_runtime API for updates
     """
-    logger.info(f"Received event: {json.dumps(event, default=str)}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Received event: %s", json.dumps(event, default=str))
     
     # Extract CloudFormation custom resource properties
     request_type = event['RequestType']
     resource_properties = event['ResourceProperties']
     
-    # Get environment variables
-    knowledge_base_id = os.environ.get('KNOWLEDGE_BASE_ID')
-    aws_region = os.environ.get('AWS_REGION')
-    
-    logger.info(f"Processing {request_type} request for {event.get('LogicalResourceId')}")
+    logger.info("Processing %s request for %s", request_type, event.get('LogicalResourceId'))
     
     # Extract parameters from CDK
-    agent_runtime_name = resource_properties['AgentRuntimeName']
-    container_uri = resource_properties['ContainerUri']
-    role_arn = resource_properties['RoleArn']
+    spec = RuntimeSpec.from_properties(resource_properties)
+    agent_runtime_name = spec.name
     
     # Simple response data - no attributes needed
     response_data = {}
     
     # Handle Physical Resource ID consistently to prevent replacement loops
     if request_type == 'Create':
-        physical_resource_id = f"agent-runtime-{agent_runtime_name}-stable"
-        logger.info(f"Create operation - using stable physical resource ID: {physical_resource_id}")
+        # Replaced with the runtime's ID once it exists, so a rollback Delete can tell nothing was created
+        physical_resource_id = _physical_resource_id(agent_runtime_name, _PENDING_SUFFIX)
+        logger.info("Create operation - using pending physical resource ID: %s", physical_resource_id)
     else:
-        physical_resource_id = event.get('PhysicalResourceId', f"agent-runtime-{agent_runtime_name}-stable")
-        logger.info(f"Update/Delete operation - using existing physical resource ID: {physical_resource_id}")
+        physical_resource_id = event.get('PhysicalResourceId', _physical_resource_id(agent_runtime_name, _STABLE_SUFFIX))
+        logger.info("Update/Delete operation - using existing physical resource ID: %s", physical_resource_id)
+    
+    response_template = build_response_template(event, context, physical_resource_id)
     
     try:
         # Create Bedrock AgentCore client
-        client = boto3.client('bedrock-agentcore-control')
+        client = get_client('bedrock-agentcore-control')
         
         if request_type == 'Create':
             try:
+                # Configure X-Ray trace destination in the background; it does not depend on the runtime
+                xray_future = _EXECUTOR.submit(configure_xray_trace_destination)
+                
                 # Create agent runtime
-                create_agent_runtime(client, agent_runtime_name, container_uri, role_arn, knowledge_base_id, aws_region, context)
-                logger.info(f"Agent runtime created successfully")
+                agent_runtime_id = create_agent_runtime(client, spec, context)
+                logger.info("Agent runtime created successfully")
+                
+                # Record the runtime ID in the physical resource ID so Delete can skip the lookup.
+                # Update keeps whatever ID CloudFormation already has, so this never causes a replacement.
+                # Without an ID, fall back to the legacy ID so Delete still looks the runtime up by name.
+                physical_resource_id = _physical_resource_id(agent_runtime_name, agent_runtime_id or _STABLE_SUFFIX)
+                response_template['PhysicalResourceId'] = physical_resource_id
+                logger.info("Create operation - using physical resource ID: %s", physical_resource_id)
                 
-                # Configure X-Ray trace destination
-                configure_xray_trace_destination()
-                logger.info("X-Ray trace destination configured")
+                # Wait a bounded time so an X-Ray hiccup can't hold up the CloudFormation response
+                try:
+                    xray_future.result(timeout=XRAY_CONFIG_TIMEOUT_SECONDS)
+                    logger.info("X-Ray trace destination configured")
+                except concurrent.futures.TimeoutError:
+                    logger.warning("X-Ray trace destination configuration still running, not waiting")
                     
             except Exception as create_error:
-                logger.error(f"Failed to create agent runtime: {create_error}")
-                send_response(event, context, 'FAILED', {'Error': str(create_error)}, physical_resource_id)
+                logger.error("Failed to create agent runtime: %s", create_error)
+                # If this invocation created the runtime before failing, record it so the rollback Delete removes it
+                if isinstance(create_error, RuntimeCreateError):
+                    physical_resource_id = _physical_resource_id(agent_runtime_name, create_error.agent_runtime_id)
+                    response_template['PhysicalResourceId'] = physical_resource_id
+                send_response(response_template, 'FAILED', {'Error': str(create_error)}, context)
                 return {'statusCode': 500, 'body': json.dumps({'Error': str(create_error)})}
                 
         elif request_type == 'Update':
-            logger.info(f"Update requested for agent runtime: {agent_runtime_name}")
+            logger.info("Update requested for agent runtime: %s", agent_runtime_name)
             try:
-                update_agent_runtime(client, agent_runtime_name, container_uri, role_arn, knowledge_base_id, aws_region, context)
+                update_agent_runtime(client, spec, context)
                 logger.info("Update completed successfully")
             except Exception as update_error:
-                logger.error(f"Failed to update agent runtime: {update_error}")
-                send_response(event, context, 'FAILED', {'Error': str(update_error)}, physical_resource_id)
+                logger.error("Failed to update agent runtime: %s", update_error)
+                send_response(response_template, 'FAILED', {'Error': str(update_error)}, context)
                 return {'statusCode': 500, 'body': json.dumps({'Error': str(update_error)})}
             
+        elif request_type == 'Delete' and physical_resource_id == _physical_resource_id(agent_runtime_name, _PENDING_SUFFIX):
+            logger.info("Create never produced a runtime for %s, nothing to delete", agent_runtime_name)
+            
         elif request_type == 'Delete':
             try:
-                delete_agent_runtime(client, agent_runtime_name, context)
+                delete_agent_runtime(
+                    client,
+                    agent_runtime_name,
+                    context,
+                    agent_runtime_id=_runtime_id_from_physical_id(physical_resource_id, agent_runtime_name)
+                )
                 logger.info("Agent runtime deletion initiated")
             except Exception as delete_error:
-                logger.error(f"Failed to delete agent runtime: {delete_error}")
+                logger.error("Failed to delete agent runtime: %s", delete_error)
                 # Don't fail delete operations - just log the error
                 pass
         
         # Send success response to CloudFormation
-        send_response(event, context, 'SUCCESS', response_data, physical_resource_id)
+        send_response(response_template, 'SUCCESS', response_data, context)
         
     except Exception as e:
-        logger.error(f"Error processing request: {str(e)}")
+        logger.error("Error processing request: %s", e)
         # Send failure response to CloudFormation
-        send_response(event, context, 'FAILED', {'Error': str(e)}, physical_resource_id)
+        send_response(response_template, 'FAILED', {'Error': str(e)}, context)
     
-    return {'statusCode': 200, 'body': json.dumps(response_data)}
+    return {'statusCode': 200, 'PhysicalResourceId': physical_resource_id, 'body': json.dumps(response_data)}
 
-def send_response(event: Dict[str, Any], context, response_status: str, response_data: Dict[str, Any], physical_resource_id: str):
-    """Send response back to CloudFormation according to the documented format"""
-    response_url = event['ResponseURL']
-    
-    # Build response according to CloudFormation custom resource documentation
-    response_body = {
-        'Status': response_status,
+def build_response_template(event: Dict[str, Any], context, physical_resource_id: str) -> Dict[str, Any]:
+    """Build the fields of the CloudFormation response that are fixed for this invocation"""
+    # Fields according to CloudFormation custom resource documentation, plus the URL to PUT to
+    return {
+        'ResponseURL': event['ResponseURL'],
         'Reason': f'See CloudWatch Log Stream: {context.log_stream_name}',
         'PhysicalResourceId': physical_resource_id,
         'StackId': event['StackId'],
         'RequestId': event['RequestId'],
         'LogicalResourceId': event['LogicalResourceId']
     }
+
+def send_response(response_template: Dict[str, Any], response_status: str, response_data: Dict[str, Any], context=None):
+    """Send response back to CloudFormation according to the documented format"""
+    response_url = response_template['ResponseURL']
+    
+    # Only the status and data vary; everything else comes from the prebuilt template
+    response_body = {key: value for key, value in response_template.items() if key != 'ResponseURL'}
+    response_body['Status'] = response_status
     
     # Only add Data if we have response_data and it's not empty
     if response_data:
         response_body['Data'] = response_data
     
-    json_response_body = json.dumps(response_body)
-    logger.info(f"Sending {response_status} response to CloudFormation")
+    # Encode once; Content-Length must count bytes, not characters
+    if orjson is not None:
+        json_response_body = orjson.dumps(response_body, option=orjson.OPT_NON_STR_KEYS)
+    else:
+        json_response_body = json.dumps(response_body).encode('utf-8')
+    logger.info("Sending %s response to CloudFormation", response_status)
     
     # Use proper headers for S3 PUT request
     headers = {
@@ -309,12 +638,39 @@ def send_response(event: Dict[str, Any], context, response_status: str, response
         'Content-Length': str(len(json_response_body))
     }
     
-    try:
-        response = http.request('PUT', response_url, body=json_response_body, headers=headers)
-        logger.info(f"CloudFormation response status: {response.status}")
-        if response.status != 200:
-            logger.error(f"CloudFormation response error: {response.data.decode('utf-8')}")
-    except Exception as e:
-        logger.error(f"Error sending response to CloudFormation: {e}")
+    # The only retry layer: each attempt's total timeout is capped by the time left before the reserve
+    send_error = None
+    for attempt, delay in enumerate(_RESPONSE_RETRY_BACKOFF, start=1):
+        timeout = Timeout(connect=RESPONSE_CONNECT_TIMEOUT_SECONDS, read=RESPONSE_READ_TIMEOUT_SECONDS)
+        if context is not None:
+            budget = (context.get_remaining_time_in_millis() - RESPONSE_RESERVE_MILLIS) / 1000
+            if budget <= 0:
+                logger.error("No time left to send the CloudFormation response (attempt %d)", attempt)
+                break
+            timeout = Timeout(
+                total=budget,
+                connect=min(RESPONSE_CONNECT_TIMEOUT_SECONDS, budget),
+                read=min(RESPONSE_READ_TIMEOUT_SECONDS, budget)
+            )
+        try:
+            response = http.request('PUT', response_url, body=json_response_body, headers=headers, timeout=timeout, retries=False)
+            logger.info("CloudFormation response status: %s", response.status)
+            if response.status == 200:
+                return
+            logger.error("CloudFormation response error: %s", response.data.decode('utf-8'))
+            # A 4xx (e.g. an expired presigned URL) won't succeed on retry
+            if response.status < 500:
+                return
+            send_error = None
+        except urllib3.exceptions.HTTPError as e:
+            logger.error("Error sending response to CloudFormation (attempt %d): %s", attempt, e)
+            send_error = e
+        
+        remaining_ms = context.get_remaining_time_in_millis() if context is not None else None
+        if delay is None or (remaining_ms is not None and remaining_ms - delay * 1000 < RESPONSE_RESERVE_MILLIS):
+            break
+        time.sleep(delay)
+    
+    if send_error is not None:
         # This is critical - if we can't respond, CloudFormation will timeout
-        raise
+        raise send_error